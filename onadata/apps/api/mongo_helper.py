@@ -1,5 +1,6 @@
 import re
 
+from bson import json_util
 
 from onadata.libs.utils.common_tags import NESTED_RESERVED_ATTRIBUTES
 from onadata.libs.utils.string import base64_encodestring
@@ -118,6 +119,25 @@ class MongoHelper:
 
         return d
 
+    @classmethod
+    def from_extended_json(cls, value):
+        """
+        Converts MongoDB Extended JSON values (e.g. `{"$date": ...}`) of an
+        already parsed JSON structure to their BSON types, like
+        `json.loads(..., object_hook=json_util.object_hook)` would do, without
+        dumping it to a string first.
+
+        :param value: dict, list or scalar
+        :return: dict, list or scalar
+        """
+        if isinstance(value, dict):
+            return json_util.object_hook(
+                {k: cls.from_extended_json(v) for k, v in value.items()}
+            )
+        if isinstance(value, list):
+            return [cls.from_extended_json(v) for v in value]
+        return value
+
     @classmethod
     def encode(cls, key):
         """
@@ -1,10 +1,14 @@
 # coding: utf-8
+import json
+from datetime import datetime, timedelta, timezone
+
 import requests
 
 from django.conf import settings
 from django.test import RequestFactory
 from guardian.shortcuts import assign_perm, remove_perm
 from kobo_service_account.utils import get_request_headers
+from mock import patch
 from rest_framework import status
 
 from onadata.apps.api.viewsets.data_viewset import DataViewSet
@@ -17,6 +21,7 @@ from onadata.libs.constants import (
     CAN_DELETE_DATA_XFORM,
     CAN_VIEW_XFORM,
 )
+from onadata.libs.utils.common_tags import MONGO_STRFTIME
 from httmock import all_requests, HTTMock
 
 
@@ -60,6 +65,36 @@ class TestDataViewSet(TestBase):
         self.extra = {
             'HTTP_AUTHORIZATION': 'Token %s' % self.user.auth_token}
 
+    def _get_mongo_ids(self, query=None):
+        query = {
+            **ParsedInstance.get_base_query(
+                self.xform.user.username, self.xform.id_string
+            ),
+            **(query or {}),
+        }
+        cursor = ParsedInstance.query_mongo_no_paging_raw(query, ['_id'])
+        return {record['_id'] for record in cursor}
+
+    def _bulk_action(self, action, data):
+        method = 'delete' if action == 'bulk_delete' else 'patch'
+        view = DataViewSet.as_view({method: action})
+        request = getattr(self.factory, method)(
+            '/', data=data, content_type='application/json', **self.extra
+        )
+        return view(request, pk=self.xform.pk)
+
+    def _assert_validation_statuses_in_sync(self, uid):
+        postgres_ids = {
+            pk
+            for pk, validation_status in self.xform.instances.values_list(
+                'pk', 'validation_status'
+            )
+            if validation_status and validation_status.get('uid') == uid
+        }
+        mongo_ids = self._get_mongo_ids({'_validation_status.uid': uid})
+        self.assertEqual(postgres_ids, mongo_ids)
+        return postgres_ids
+
     def test_data(self):
         self._make_submissions()
         view = DataViewSet.as_view({'get': 'list'})
@@ -93,6 +128,40 @@ class TestDataViewSet(TestBase):
         self.assertEqual(dict(response.data, **data),
                          response.data)
 
+    def test_data_conditional_get(self):
+        self._make_submissions()
+        view = DataViewSet.as_view({'get': 'list'})
+        formid = self.xform.pk
+
+        request = self.factory.get('/', **self.extra)
+        response = view(request, pk=formid).render()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        # Same data, nothing is sent back
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH=etag, **self.extra)
+        response = view(request, pk=formid).render()
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(response.content)
+
+        # Change one submission, data are sent again with a new ETag
+        dataid = self.xform.instances.all().order_by('id')[0].pk
+        request = self.factory.patch(
+            '/',
+            data={'validation_status.uid': 'validation_status_on_hold'},
+            format='json',
+            **self.extra
+        )
+        response = DataViewSet.as_view({'patch': 'validation_status'})(
+            request, pk=formid, dataid=dataid
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH=etag, **self.extra)
+        response = view(request, pk=formid).render()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
     def test_data_with_service_account(self):
         self._make_submissions()
         view = DataViewSet.as_view({'get': 'list'})
@@ -219,6 +288,7 @@ class TestDataViewSet(TestBase):
         view = DataViewSet.as_view({'get': 'retrieve'})
         response = view(request, pk=formid, dataid=dataid)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['detail'], 'Invalid dataid `INVALID`')
 
     def test_data_with_query_parameter(self):
         self._make_submissions()
@@ -287,6 +357,30 @@ class TestDataViewSet(TestBase):
         response = view(request, pk=pk, dataid=dataid, label='hello')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_delete_labels(self):
+        self._make_submissions()
+        instance = self.xform.instances.order_by('pk').first()
+        instance.tags.add('hello', 'world')
+        view = DataViewSet.as_view({'delete': 'labels'})
+
+        # Statuses are inverted: 404 when the label has been removed
+        request = self.factory.delete('/', **self.extra)
+        response = view(
+            request, pk=self.xform.pk, dataid=instance.pk, label='hello'
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data, ['world'])
+        self.assertEqual(list(instance.tags.names()), ['world'])
+
+        # and 200 when there was nothing to remove
+        request = self.factory.delete('/', **self.extra)
+        response = view(
+            request, pk=self.xform.pk, dataid=instance.pk, label='hello'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, ['world'])
+        self.assertEqual(list(instance.tags.names()), ['world'])
+
     def test_data_list_filter_by_user(self):
         self._make_submissions()
         view = DataViewSet.as_view({'get': 'list'})
@@ -660,6 +754,282 @@ class TestDataViewSet(TestBase):
         count = self.xform.instances.all().count()
         self.assertEqual(before_count - 2, count)
 
+    def test_bulk_delete_keeps_mongo_documents_if_postgres_fails(self):
+        self._make_submissions()
+        view = DataViewSet.as_view({'delete': 'bulk_delete'})
+        formid = self.xform.pk
+        all_ids = set(self.xform.instances.values_list('pk', flat=True))
+        submission_ids = sorted(all_ids)[:2]
+        data = {'submission_ids': submission_ids}
+        request = self.factory.delete(
+            '/', data=data, content_type='application/json', **self.extra,
+        )
+        with patch.object(
+            DataViewSet,
+            '_DataViewSet__delete_instances',
+            side_effect=RuntimeError,
+        ):
+            with self.assertRaises(RuntimeError):
+                view(request, pk=formid)
+
+        # Nothing has been deleted from MongoDB
+        self.assertEqual(self._get_mongo_ids(), all_ids)
+
+    def test_bulk_delete_with_translated_query(self):
+        self._make_submissions()
+        submission_ids = sorted(
+            self.xform.instances.values_list('pk', flat=True)
+        )
+        response = self._bulk_action(
+            'bulk_delete', {'query': {'_id': {'$in': submission_ids[:2]}}}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['detail'], '2 submissions have been deleted')
+        remaining_ids = set(self.xform.instances.values_list('pk', flat=True))
+        self.assertEqual(remaining_ids, set(submission_ids[2:]))
+        self.assertEqual(self._get_mongo_ids(), remaining_ids)
+
+    def test_bulk_delete_with_translated_query_does_not_need_confirm(self):
+        self._make_submissions()
+        submission_status = self.xform.instances.first().status
+        expected_ids = set(
+            self.xform.instances.filter(
+                status=submission_status
+            ).values_list('pk', flat=True)
+        )
+        response = self._bulk_action(
+            'bulk_delete', {'query': {'_status': submission_status}}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['detail'],
+            f'{len(expected_ids)} submissions have been deleted',
+        )
+        remaining_ids = set(self.xform.instances.values_list('pk', flat=True))
+        self.assertFalse(remaining_ids & expected_ids)
+        self.assertEqual(self._get_mongo_ids(), remaining_ids)
+
+    def test_bulk_delete_with_submission_time_query(self):
+        self._make_submissions()
+        first = self.xform.instances.order_by('date_created').first()
+        submission_time = first.date_created.strftime(MONGO_STRFTIME)
+        expected_ids = self._get_mongo_ids(
+            {'_submission_time': {'$gt': submission_time}}
+        )
+        response = self._bulk_action(
+            'bulk_delete',
+            {'query': {'_submission_time': {'$gt': submission_time}}},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['detail'],
+            f'{len(expected_ids)} submissions have been deleted',
+        )
+        remaining_ids = set(self.xform.instances.values_list('pk', flat=True))
+        self.assertFalse(remaining_ids & expected_ids)
+        self.assertIn(first.pk, remaining_ids)
+        self.assertEqual(self._get_mongo_ids(), remaining_ids)
+
+    def test_bulk_delete_with_untranslated_query(self):
+        self._make_submissions()
+        query = {
+            'transport/available_transportation_types_to_referral_facility': 'none'
+        }
+        expected_ids = self._get_mongo_ids(query)
+        self.assertEqual(len(expected_ids), 1)
+        response = self._bulk_action('bulk_delete', {'query': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['detail'], '1 submissions have been deleted')
+        remaining_ids = set(self.xform.instances.values_list('pk', flat=True))
+        self.assertFalse(remaining_ids & expected_ids)
+        self.assertEqual(self._get_mongo_ids(), remaining_ids)
+
+    def test_bulk_delete_with_empty_operator_query_deletes_nothing(self):
+        self._make_submissions()
+        submission_ids = set(self.xform.instances.values_list('pk', flat=True))
+        response = self._bulk_action('bulk_delete', {'query': {'_id': {}}})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['detail'], '0 submissions have been deleted')
+        remaining_ids = set(self.xform.instances.values_list('pk', flat=True))
+        self.assertEqual(remaining_ids, submission_ids)
+        self.assertEqual(self._get_mongo_ids(), submission_ids)
+
+    def test_bulk_delete_with_duplicate_submission_ids(self):
+        self._make_submissions()
+        submission_id = self.xform.instances.order_by('pk').first().pk
+        response = self._bulk_action(
+            'bulk_delete', {'submission_ids': [submission_id, submission_id]}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['detail'], '1 submissions have been deleted')
+        self.assertFalse(self.xform.instances.filter(pk=submission_id).exists())
+
+    def test_bulk_delete_with_invalid_submission_ids(self):
+        self._make_submissions()
+        count = self.xform.instances.count()
+        invalid_submission_ids = [
+            [None],
+            [[1]],
+            ['a'],
+            [9223372036854775808],
+        ]
+        for submission_ids in invalid_submission_ids:
+            response = self._bulk_action(
+                'bulk_delete', {'submission_ids': submission_ids}
+            )
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST, submission_ids
+            )
+            self.assertEqual(
+                response.data['payload'],
+                f'Invalid submission ids: {json.dumps(submission_ids)}',
+            )
+        self.assertEqual(self.xform.instances.count(), count)
+
+    def test_bulk_update_validation_status_with_translated_query(self):
+        self._make_submissions()
+        submission_ids = sorted(
+            self.xform.instances.values_list('pk', flat=True)
+        )
+        response = self._bulk_action(
+            'bulk_validation_status',
+            {
+                'query': {'_id': {'$gt': submission_ids[1]}},
+                'validation_status.uid': 'validation_status_on_hold',
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['detail'], '2 submissions have been updated'
+        )
+        updated_ids = self._assert_validation_statuses_in_sync(
+            'validation_status_on_hold'
+        )
+        self.assertEqual(updated_ids, set(submission_ids[2:]))
+
+    def test_bulk_update_validation_status_with_submission_time_query(self):
+        self._make_submissions()
+        first = self.xform.instances.order_by('date_created').first()
+        submission_time = first.date_created.strftime(MONGO_STRFTIME)
+        expected_ids = self._get_mongo_ids(
+            {'_submission_time': submission_time}
+        )
+        response = self._bulk_action(
+            'bulk_validation_status',
+            {
+                'query': {'_submission_time': submission_time},
+                'validation_status.uid': 'validation_status_approved',
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['detail'],
+            f'{len(expected_ids)} submissions have been updated',
+        )
+        updated_ids = self._assert_validation_statuses_in_sync(
+            'validation_status_approved'
+        )
+        self.assertEqual(updated_ids, expected_ids)
+
+    def test_bulk_update_validation_status_with_untranslated_query(self):
+        self._make_submissions()
+        query = {
+            'transport/available_transportation_types_to_referral_facility': 'none'
+        }
+        expected_ids = self._get_mongo_ids(query)
+        response = self._bulk_action(
+            'bulk_validation_status',
+            {
+                'query': query,
+                'validation_status.uid': 'validation_status_not_approved',
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['detail'], '1 submissions have been updated'
+        )
+        updated_ids = self._assert_validation_statuses_in_sync(
+            'validation_status_not_approved'
+        )
+        self.assertEqual(updated_ids, expected_ids)
+
+    def test_bulk_action_with_untranslated_query_on_all_submissions(self):
+        self._make_submissions()
+        # `$exists` cannot be translated; ids are fetched from MongoDB
+        response = self._bulk_action(
+            'bulk_delete', {'query': {'_id': {'$exists': True}}}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(self.xform.instances.exists())
+        self.assertEqual(self._get_mongo_ids(), set())
+
+    def test_bulk_query_translation_to_postgres_filters(self):
+        get_postgres_filters = DataViewSet._DataViewSet__get_postgres_filters
+        start = datetime(2022, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        end = start + timedelta(seconds=1)
+        submission_time = start.strftime(MONGO_STRFTIME)
+
+        # `_userform_id` is already covered by `xform_id`
+        self.assertEqual(
+            get_postgres_filters({
+                '_userform_id': 'bob_form',
+                '_id': {'$in': [1, 2]},
+                '_status': 'submitted_via_web',
+            }),
+            {'id__in': [1, 2], 'status': 'submitted_via_web'},
+        )
+        self.assertEqual(
+            get_postgres_filters({'_id': {'$gte': 3, '$lt': 10}}),
+            {'id__gte': 3, 'id__lt': 10},
+        )
+
+        # MongoDB compares `_submission_time` truncated to the second
+        self.assertEqual(
+            get_postgres_filters({'_submission_time': submission_time}),
+            {'date_created__gte': start, 'date_created__lt': end},
+        )
+        self.assertEqual(
+            get_postgres_filters({'_submission_time': {'$gt': submission_time}}),
+            {'date_created__gte': end},
+        )
+        self.assertEqual(
+            get_postgres_filters({'_submission_time': {'$gte': submission_time}}),
+            {'date_created__gte': start},
+        )
+        self.assertEqual(
+            get_postgres_filters({'_submission_time': {'$lt': submission_time}}),
+            {'date_created__lt': start},
+        )
+        self.assertEqual(
+            get_postgres_filters({'_submission_time': {'$lte': submission_time}}),
+            {'date_created__lt': end},
+        )
+
+        untranslatable_queries = [
+            # Booleans and strings are not ids
+            {'_id': True},
+            {'_id': '1'},
+            {'_id': {'$in': [1, False]}},
+            # Unsupported operators or fields
+            {'_id': {'$exists': True}},
+            {'_status': {'$regex': 'web'}},
+            {'$or': [{'_id': 1}, {'_id': 2}]},
+            {'question': 'answer'},
+            # Empty documents are compared as values, not as operators
+            {'_id': {}},
+            {'_status': {}},
+            {'_submission_time': {}},
+            # Not the exact format MongoDB stores
+            {'_submission_time': '2022-01-02'},
+            {'_submission_time': '2022-01-02T03:04:05.123'},
+            # Both operators map to the same lookup
+            {'_submission_time': {
+                '$gt': submission_time, '$gte': submission_time,
+            }},
+        ]
+        for query in untranslatable_queries:
+            self.assertIsNone(get_postgres_filters(query), query)
+
     def test_update_validation_status(self):
         self._make_submissions()
         view = DataViewSet.as_view({'patch': 'validation_status'})
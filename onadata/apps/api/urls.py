@@ -74,15 +74,20 @@ class MultiLookupRouter(routers.DefaultRouter):
     def get_lookup_regexes(self, viewset):
         ret = []
         lookup_fields = getattr(viewset, 'lookup_fields', None)
+        # Viewsets can restrict values of each lookup field, e.g. `r'\d+'`
+        lookup_value_regexes = getattr(viewset, 'lookup_value_regexes', {})
         if lookup_fields:
             for i in range(1, len(lookup_fields)):
                 tmp = []
                 for lookup_field in lookup_fields[:i + 1]:
                     if lookup_field == lookup_fields[i]:
-                        base_regex = '(?P<{lookup_field}>[^/.]+)'
+                        value_regex = '[^/.]+'
                     else:
-                        base_regex = '(?P<{lookup_field}>[^/]+)'
-                    tmp.append(base_regex.format(lookup_field=lookup_field))
+                        value_regex = '[^/]+'
+                    value_regex = lookup_value_regexes.get(
+                        lookup_field, value_regex
+                    )
+                    tmp.append(f'(?P<{lookup_field}>{value_regex})')
                 ret.append(tmp)
         return ret
 
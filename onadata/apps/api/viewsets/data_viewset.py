@@ -1,13 +1,18 @@
 # coding: utf-8
 import logging
 import json
-from typing import Union
-
-from django.db.models import Q
-from django.db.models.signals import pre_delete, post_delete
-from django.http import Http404
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Union
+
+import numpy as np
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
 from django.utils.translation import gettext as t
+from django.views.decorators.http import conditional_page
 from kobo_service_account.utils import get_real_user
 from rest_framework import status
 from rest_framework.decorators import action
@@ -16,23 +21,25 @@ from rest_framework.viewsets import ModelViewSet
 from rest_framework.exceptions import ParseError
 from rest_framework.serializers import ValidationError
 from rest_framework.settings import api_settings
+from taggit.models import TaggedItem
 
 from onadata.apps.api.exceptions import NoConfirmationProvidedException
+from onadata.apps.api.mongo_helper import MongoHelper
 from onadata.apps.api.viewsets.xform_viewset import custom_response_handler
 from onadata.apps.api.tools import add_tags_to_instance, \
     add_validation_status_to_instance, get_validation_status, \
     remove_validation_status_from_instance
+from onadata.apps.logger.models import Attachment, Note
 from onadata.apps.logger.models.xform import XForm
 from onadata.apps.logger.models.instance import (
     Instance,
+    InstanceHistory,
     nullify_exports_time_of_last_submission,
     update_xform_submission_count_delete,
 )
 from onadata.apps.main.models import UserProfile
-from onadata.apps.viewer.models.parsed_instance import (
-    _remove_from_mongo,
-    ParsedInstance,
-)
+from onadata.apps.viewer.models import InstanceModification
+from onadata.apps.viewer.models.parsed_instance import ParsedInstance
 from onadata.libs.renderers import renderers
 from onadata.libs.mixins.anonymous_user_public_forms_mixin import (
     AnonymousUserPublicFormsMixin)
@@ -44,6 +51,7 @@ from onadata.apps.api.permissions import (
 from onadata.libs.serializers.data_serializer import (
     DataSerializer, DataListSerializer, DataInstanceSerializer)
 from onadata.libs import filters
+from onadata.libs.utils.common_tags import MONGO_STRFTIME, SUBMISSION_TIME
 from onadata.libs.utils.viewer_tools import (
     EnketoError,
     get_enketo_submission_url,
@@ -380,7 +388,9 @@ Delete a specific submission in a form
 >
 >
 """
-    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [
+    renderer_classes = [
+        renderers.OrjsonRenderer
+    ] + api_settings.DEFAULT_RENDERER_CLASSES + [
         renderers.XLSRenderer,
         renderers.XLSXRenderer,
         renderers.CSVRenderer,
@@ -393,6 +403,9 @@ Delete a specific submission in a form
     permission_classes = (XFormDataPermissions,)
     lookup_field = 'pk'
     lookup_fields = ('pk', 'dataid')
+    # Let the router reject non-integer ids
+    lookup_value_regex = r'\d+'
+    lookup_value_regexes = {'pk': r'\d+', 'dataid': r'\d+'}
     extra_lookup_fields = None
     queryset = XForm.objects.all()
 
@@ -403,50 +416,30 @@ Delete a specific submission in a form
         xform = self.get_object()
         postgres_query, mongo_query = self.__build_db_queries(xform, request.data)
 
-        # Disconnect signals to speed-up bulk deletion
-        pre_delete.disconnect(_remove_from_mongo, sender=ParsedInstance)
-        post_delete.disconnect(
-            nullify_exports_time_of_last_submission, sender=Instance,
-            dispatch_uid='nullify_exports_time_of_last_submission',
-        )
-        post_delete.disconnect(
-            update_xform_submission_count_delete, sender=Instance,
-            dispatch_uid='update_xform_submission_count_delete',
-        )
-
-        try:
-            # Delete Postgres & Mongo
-            all_count, results = Instance.objects.filter(**postgres_query).delete()
-            identifier = f'{Instance._meta.app_label}.Instance'
-            try:
-                deleted_records_count = results[identifier]
-            except KeyError:
-                # PostgreSQL did not delete any Instance objects. Keep going in case
-                # they are still present in MongoDB.
-                logging.warning('Instance objects cannot be found')
-                deleted_records_count = 0
-
-            ParsedInstance.bulk_delete(mongo_query)
-
-            # Update xform like signals would do if it was as single object deletion
-            nullify_exports_time_of_last_submission(sender=Instance, instance=xform)
+        # Delete Postgres & Mongo.
+        # `Instance` and `ParsedInstance` rows are deleted with raw DELETE
+        # statements which do not send any signals, so there is no need to
+        # disconnect their receivers (which would affect concurrent requests).
+        deleted_records_count = self.__delete_instances(postgres_query)
+        if not deleted_records_count:
+            # PostgreSQL did not delete any Instance objects. Keep going in case
+            # they are still present in MongoDB.
+            logging.warning('Instance objects cannot be found')
+
+        # Not run concurrently with the PostgreSQL deletion on purpose:
+        # MongoDB documents cannot be restored if the request transaction
+        # rolls back, so only delete them once PostgreSQL succeeded.
+        ParsedInstance.bulk_delete(mongo_query)
+
+        # Update xform like signals would do if it was as single object deletion
+        nullify_exports_time_of_last_submission(sender=Instance, instance=xform)
+        if deleted_records_count:
+            # Counters are decremented atomically with `F()` expressions;
+            # nothing to do if no rows were deleted
             update_xform_submission_count_delete(
                 sender=Instance,
                 instance=xform, value=deleted_records_count
             )
-        finally:
-            # Pre_delete signal needs to be re-enabled for parsed instance
-            pre_delete.connect(_remove_from_mongo, sender=ParsedInstance)
-            post_delete.connect(
-                nullify_exports_time_of_last_submission,
-                sender=Instance,
-                dispatch_uid='nullify_exports_time_of_last_submission',
-            )
-            post_delete.connect(
-                update_xform_submission_count_delete,
-                sender=Instance,
-                dispatch_uid='update_xform_submission_count_delete',
-            )
 
         return Response({
             'detail': t('{} submissions have been deleted').format(
@@ -510,17 +503,24 @@ Delete a specific submission in a form
         if pk is None or dataid is None:
             return xform
 
-        try:
-            int(pk)
-        except ValueError:
-            raise ParseError(t("Invalid pk `%(pk)s`" % {'pk': pk}))
-        try:
-            int(dataid)
-        except ValueError:
+        return get_object_or_404(
+            Instance.objects.select_related('xform__user'),
+            pk=self.__validate_dataid(dataid),
+            xform__pk=pk,
+        )
+
+    @staticmethod
+    def __validate_dataid(dataid) -> str:
+        # The router only accepts digits, but views can be called without
+        # going through the URL resolver
+        if not str(dataid).isdigit():
             raise ParseError(t("Invalid dataid `%(dataid)s`"
                                % {'dataid': dataid}))
+        return dataid
 
-        return get_object_or_404(Instance, pk=dataid, xform__pk=pk)
+    def get_queryset(self):
+        # Serializers and bulk actions need the owner's username
+        return super().get_queryset().select_related('user')
 
     def _get_public_forms_queryset(self):
         return XForm.objects.filter(Q(shared=True) | Q(shared_data=True))
@@ -531,7 +531,7 @@ Delete a specific submission in a form
 
         if not qs:
             filter_kwargs['shared_data'] = True
-            qs = XForm.objects.filter(**filter_kwargs)
+            qs = XForm.objects.select_related('user').filter(**filter_kwargs)
             if not qs:
                 raise Http404(t("No data matches with given query."))
 
@@ -544,7 +544,16 @@ Delete a specific submission in a form
 
         if tags and isinstance(tags, str):
             tags = tags.split(',')
-            qs = qs.filter(tags__name__in=tags).distinct()
+            # `EXISTS` avoids the `DISTINCT` needed with a join on tags
+            qs = qs.filter(
+                Exists(
+                    TaggedItem.objects.filter(
+                        content_type=ContentType.objects.get_for_model(XForm),
+                        object_id=OuterRef('pk'),
+                        tag__name__in=tags,
+                    )
+                )
+            )
 
         if pk:
             try:
@@ -608,14 +617,17 @@ Delete a specific submission in a form
                     tags.filter(name=label).values('name')]
 
         elif request.method == 'DELETE' and label:
-            count = tags.count()
-            tags.remove(label)
+            with transaction.atomic():
+                deleted, _ = TaggedItem.objects.filter(
+                    content_type=ContentType.objects.get_for_model(Instance),
+                    object_id=instance.pk,
+                    tag__name=label,
+                ).delete()
+                data = list(tags.values_list('name', flat=True))
 
             # Accepted, label does not exist hence nothing removed
-            http_status = status.HTTP_200_OK if count == tags.count() \
-                else status.HTTP_404_NOT_FOUND
-
-            data = list(tags.names())
+            http_status = status.HTTP_404_NOT_FOUND if deleted \
+                else status.HTTP_200_OK
         else:
             data = list(tags.names())
 
@@ -648,7 +660,12 @@ Delete a specific submission in a form
         Avoid the infinite loop by blocking doomed requests here and returning
         a helpful error message.
         """
-        profile = UserProfile.objects.get_or_create(user=request.user)[0]
+        try:
+            profile = request.user.profile
+        except UserProfile.DoesNotExist:
+            # Users created by KPI may not have a profile yet
+            profile = UserProfile.objects.get_or_create(user=request.user)[0]
+
         if not profile.require_auth:
             raise ValidationError(t(
                 'Cannot edit submissions while "Require authentication to see '
@@ -686,8 +703,19 @@ Delete a specific submission in a form
     def retrieve(self, request, *args, **kwargs):
         # XML rendering does not a serializer
         if request.accepted_renderer.format == "xml":
-            instance = self.get_object()
-            return Response(instance.xml)
+            # Check permissions on the form, then only fetch the XML of the
+            # submission (`json` and `geom` can be large)
+            xform = super().get_object()
+            instance = get_object_or_404(
+                Instance.objects.only('xml', 'xform_id'),
+                pk=self.__validate_dataid(self.kwargs.get(self.lookup_fields[1])),
+                xform_id=xform.pk,
+            )
+            renderer = request.accepted_renderer
+            return HttpResponse(
+                instance.xml,
+                content_type=f'{renderer.media_type}; charset={renderer.charset}',
+            )
         else:
             return super().retrieve(request, *args, **kwargs)
 
@@ -702,28 +730,82 @@ Delete a specific submission in a form
 
     def list(self, request, *args, **kwargs):
         lookup_field = self.lookup_field
-        lookup = self.kwargs.get(lookup_field)
+        export_type = kwargs.get('format')
+
+        if (
+            lookup_field not in kwargs.keys()
+            or export_type is None
+            or export_type in ['json']
+        ):
+            return self.__list_data(request, *args, **kwargs)
 
-        if lookup_field not in kwargs.keys():
+        xform = self.get_object()
+        query = request.GET.get("query", {})
+        return custom_response_handler(request, xform, query, export_type)
+
+    # Send an `ETag` header and reply with "304 Not Modified" when clients
+    # already have the same data. The ETag is a hash of the rendered body:
+    # data are still fetched and serialized on every request, only the
+    # transfer of unchanged data is saved. Exports are not covered, they are
+    # generated and logged by `custom_response_handler()`.
+    @method_decorator(conditional_page)
+    def __list_data(self, request, *args, **kwargs):
+        if self.lookup_field not in kwargs.keys():
             self.object_list = self.filter_queryset(self.get_queryset())
             serializer = self.get_serializer(self.object_list, many=True)
 
             return Response(serializer.data)
 
         xform = self.get_object()
-        query = request.GET.get("query", {})
-        export_type = kwargs.get('format')
-        if export_type is None or export_type in ['json']:
-            # perform default viewset retrieve, no data export
+        # No data export. `DataListSerializer` already returns a list of
+        # submissions for the form, so serialize it directly instead of
+        # letting DRF filter the forms again and wrap the result in a
+        # `ListSerializer`.
+        serializer = self.get_serializer(xform)
+        return Response(serializer.to_representation(xform))
 
-            # With DRF ListSerializer are automatically created and wraps
-            # everything in a list. Since this returns a list
-            # # already, we unwrap it.
-            res = super().list(request, *args, **kwargs)
-            res.data = res.data[0]
-            return res
+    @staticmethod
+    def __delete_instances(postgres_query: dict) -> int:
+        """
+        Delete `Instance` objects matching `postgres_query` and their related
+        objects without going through Django's deletion collector, which
+        fetches every object into memory and deletes them table by table.
 
-        return custom_response_handler(request, xform, query, export_type)
+        `Attachment` objects are still deleted the regular way because their
+        signals remove files from storage and update storage counters.
+
+        Returns the number of deleted `Instance` objects.
+        """
+        instance_ids = tuple(
+            Instance.objects.filter(**postgres_query).values_list(
+                'pk', flat=True
+            )
+        )
+        if not instance_ids:
+            return 0
+
+        with transaction.atomic():
+            Attachment.objects.filter(instance_id__in=instance_ids).delete()
+
+            related_querysets = [
+                ParsedInstance.objects.filter(instance_id__in=instance_ids),
+                Note.objects.filter(instance_id__in=instance_ids),
+                InstanceModification.objects.filter(
+                    instance_id__in=instance_ids
+                ),
+                InstanceHistory.objects.filter(
+                    xform_instance_id__in=instance_ids
+                ),
+                TaggedItem.objects.filter(
+                    content_type=ContentType.objects.get_for_model(Instance),
+                    object_id__in=instance_ids,
+                ),
+            ]
+            for queryset in related_querysets:
+                queryset._raw_delete(queryset.db)
+
+            queryset = Instance.objects.filter(pk__in=instance_ids)
+            return queryset._raw_delete(queryset.db)
 
     @staticmethod
     def __build_db_queries(xform_, request_data):
@@ -746,28 +828,25 @@ Delete a specific submission in a form
         mongo_query = ParsedInstance.get_base_query(xform_.user.username,
                                                     xform_.id_string)
         postgres_query = {'xform_id': xform_.id}
+        postgres_filters = None
         instance_ids = None
-        # Remove empty values
-        payload = {
-            key_: value_ for key_, value_ in request_data.items() if value_
-        }
+        # Only these keys are used, empty values are ignored
+        query = request_data.get('query') or None
+        submission_ids = request_data.get('submission_ids') or None
+        confirm = request_data.get('confirm', False)
         ###################################################
         # Submissions can be retrieve in 3 different ways #
         ###################################################
         # First of all,
         # users cannot send `query` and `submission_ids` in POST/PATCH request
         #
-        if all(key_ in payload for key_ in ('query', 'submission_ids')):
+        if query is not None and submission_ids is not None:
             raise ValidationError({
                 'payload': t("`query` and `instance_ids` can't be used together")
             })
 
         # First scenario / Get submissions based on user's query
-        try:
-            query = payload['query']
-        except KeyError:
-            pass
-        else:
+        if query is not None:
             try:
                 query.update(mongo_query)  # Overrides `_userform_id` if exists
             except AttributeError:
@@ -776,38 +855,145 @@ Delete a specific submission in a form
                                % {'query': json.dumps(query)}
                 })
 
-            query_kwargs = {
-                'query': json.dumps(query),
-                'fields': '["_id"]'
-            }
-
-            cursor = ParsedInstance.query_mongo_no_paging(**query_kwargs)
-            instance_ids = [record.get('_id') for record in list(cursor)]
+            query = MongoHelper.to_safe_dict(
+                MongoHelper.from_extended_json(query), reading=True
+            )
+            postgres_filters = DataViewSet.__get_postgres_filters(query)
+            if postgres_filters is not None:
+                # The query can be run on both databases, no need to fetch
+                # the ids from MongoDB first
+                postgres_query.update(postgres_filters)
+                mongo_query = query
+            else:
+                # Only `_id` is needed, let MongoDB project it out server-side
+                cursor = ParsedInstance.query_mongo_no_paging_raw(
+                    query, ['_id']
+                ).batch_size(ParsedInstance.BULK_ACTION_BATCHSIZE)
+                instance_ids = [record['_id'] for record in cursor]
 
         # Second scenario / Get submissions based on list of ids
-        try:
-            submission_ids = payload['submission_ids']
-        except KeyError:
-            pass
-        else:
+        elif submission_ids is not None:
             try:
-                # Use int() to test if list of integers is valid.
-                instance_ids = [int(submission_id)
-                                for submission_id in submission_ids]
-            except ValueError:
+                # Let NumPy validate (and deduplicate) the list of integers
+                ids_array = np.asarray(submission_ids, dtype=np.int64)
+                if ids_array.ndim != 1:
+                    # NumPy accepts scalars and nested lists as well
+                    raise ValueError
+                instance_ids = np.unique(ids_array).tolist()
+            except (TypeError, ValueError, OverflowError):
                 raise ValidationError({
                     'payload': t('Invalid submission ids: %(submission_ids)s')
-                               % {'submission_ids':
-                                  json.dumps(payload['submission_ids'])}
+                               % {'submission_ids': json.dumps(submission_ids)}
                 })
 
         if instance_ids is not None:
             # Narrow down queries with list of ids.
             postgres_query.update({'id__in': instance_ids})
             mongo_query.update({'_id': {'$in': instance_ids}})
-        elif payload.get('confirm', False) is not True:
+        elif postgres_filters is None and confirm is not True:
             # Third scenario / get all submissions in form,
             # but confirmation param must be among payload
             raise NoConfirmationProvidedException()
 
         return postgres_query, mongo_query
+
+    @staticmethod
+    def __get_postgres_filters(query: dict) -> Optional[dict]:
+        """
+        Translates a Mongo query into `Instance` lookups when it only uses
+        simple operators on fields which are also stored in PostgreSQL
+        (`_id`, `_status` and `_submission_time`).
+
+        Args:
+            query (dict): Mongo query, already made safe by `MongoHelper`
+
+        Returns:
+            dict: lookups to use with a Django Queryset, or `None` if the
+                query cannot be translated.
+        """
+        filters = {}
+        for field, condition in query.items():
+            if field == ParsedInstance.USERFORM_ID:
+                # Already covered by `xform_id`
+                continue
+
+            if not isinstance(condition, dict):
+                condition = {None: condition}
+            elif not condition:
+                # MongoDB compares the field with an empty document, which
+                # matches nothing; there is no lookup to express it.
+                return None
+
+            for operator, value in condition.items():
+                lookups = DataViewSet.__get_postgres_lookups(
+                    field, operator, value
+                )
+                if lookups is None or filters.keys() & lookups.keys():
+                    return None
+                filters.update(lookups)
+
+        return filters
+
+    @staticmethod
+    def __get_postgres_lookups(
+        field: str, operator: Optional[str], value
+    ) -> Optional[dict]:
+        """
+        Returns `Instance` lookups matching `{field: {operator: value}}`, or
+        `None` if they cannot be expressed in PostgreSQL. A `None` operator
+        means equality.
+        """
+        comparisons = {
+            None: '',
+            '$gt': '__gt',
+            '$gte': '__gte',
+            '$lt': '__lt',
+            '$lte': '__lte',
+        }
+
+        if field == '_id':
+            values = value if operator == '$in' else [value]
+            if not isinstance(values, list) or not all(
+                isinstance(v, int) and not isinstance(v, bool) for v in values
+            ):
+                return None
+            if operator == '$in':
+                return {'id__in': values}
+            if operator in comparisons:
+                return {f'id{comparisons[operator]}': value}
+            return None
+
+        if field == ParsedInstance.STATUS:
+            if operator is None and isinstance(value, str):
+                return {'status': value}
+            if (
+                operator == '$in'
+                and isinstance(value, list)
+                and all(isinstance(v, str) for v in value)
+            ):
+                return {'status__in': value}
+            return None
+
+        if field == SUBMISSION_TIME and operator in comparisons:
+            # MongoDB compares `_submission_time` as strings truncated to the
+            # second, whereas `date_created` has microseconds
+            try:
+                start = datetime.strptime(value, MONGO_STRFTIME)
+            except (TypeError, ValueError):
+                return None
+            if start.strftime(MONGO_STRFTIME) != value:
+                return None
+            start = start.replace(tzinfo=timezone.utc)
+            end = start + timedelta(seconds=1)
+            return {
+                None: {
+                    'date_created__gte': start,
+                    'date_created__lt': end,
+                },
+                '$gt': {'date_created__gte': end},
+                '$gte': {'date_created__gte': start},
+                '$lt': {'date_created__lt': start},
+                '$lte': {'date_created__lt': end},
+            }[operator]
+
+        return None
@@ -4,7 +4,10 @@
 from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand
 
-from onadata.libs.utils.briefcase_client import BriefcaseClient
+from onadata.libs.utils.briefcase_client import (
+    BriefcaseClient,
+    DEFAULT_MAX_WORKERS,
+)
 
 
 class Command(BaseCommand):
@@ -23,12 +26,19 @@ class Command(BaseCommand):
         parser.add_argument('--to',
                             help="username in this server")
 
+        parser.add_argument('--workers',
+                            type=int,
+                            default=DEFAULT_MAX_WORKERS,
+                            help="Number of forms to download submissions "
+                                 "for simultaneously")
+
     def handle(self, *args, **kwargs):
         url = kwargs.get('url')
         username = kwargs.get('username')
         password = kwargs.get('password')
         to = kwargs.get('to')
+        workers = kwargs.get('workers')
         user = User.objects.get(username=to)
         bc = BriefcaseClient(username=username, password=password,
                              user=user, url=url)
-        bc.download_xforms(include_instances=True)
+        bc.download_xforms(include_instances=True, max_workers=workers)
@@ -1,11 +1,11 @@
 from __future__ import annotations
 
-from collections import defaultdict
-
 from django.core.management.base import BaseCommand
-from django.db.models import Sum, Q, OuterRef, Subquery
+from django.db import connection
+from django.db.models import Sum, OuterRef, Subquery
 
 from onadata.apps.logger.models.attachment import Attachment
+from onadata.apps.logger.models.instance import Instance
 from onadata.apps.logger.models.xform import XForm
 from onadata.apps.main.models.user_profile import UserProfile
 from onadata.libs.utils.jsonbfield_helper import ReplaceValues
@@ -17,11 +17,14 @@ class Command(BaseCommand):
         'per xform and user profile'
     )
 
+    XFORMS_CHUNK_SIZE = 2000
+
     def handle(self, *args, **kwargs):
         self.verbosity = kwargs['verbosity']
 
-        # Release any locks on the users' profile from getting submissions
-        UserProfile.objects.all().update(
+        # Release any locks on the users' profile from getting submissions.
+        # Only suspended profiles are rewritten.
+        UserProfile.objects.filter(metadata__submissions_suspended=True).update(
             metadata=ReplaceValues(
                 'metadata',
                 updates={'submissions_suspended': False},
@@ -34,88 +37,128 @@ class Command(BaseCommand):
             metadata__attachments_counting_status='complete'
         )
         # Get only xforms whose users' storage counters have not been updated yet
-        xforms = (
+        # Evaluated once (several passes are made over the results below) and
+        # fetched in chunks through a server-side cursor
+        xforms = list(
             XForm.objects.exclude(user_id__in=subquery)
             .values('pk', 'user_id', 'user__username')
             .order_by('user_id')
+            .iterator(chunk_size=self.XFORMS_CHUNK_SIZE)
         )
+        user_ids = sorted({xform['user_id'] for xform in xforms})
 
-        last_xform = None
-
-        for xform in xforms:
-
-            if not last_xform or (last_xform['user_id'] != xform['user_id']):
-
-                # All forms for the previous user are complete; update that user's profile
-                if last_xform:
-                    self.update_user_profile(last_xform)
-
-                # Retrieve or create user's profile.
-                (
-                    user_profile,
-                    created,
-                ) = UserProfile.objects.get_or_create(user_id=xform['user_id'])
+        # Suspend submissions of every user before counting anything; otherwise
+        # attachments received between the aggregation below and the update
+        # of their form would be lost.
+        self.suspend_submissions(user_ids)
 
-                # Some old profiles don't have metadata
-                if user_profile.metadata is None:
-                    user_profile.metadata = {}
+        # Aggregate total media file size for all media per xform and save it
+        # on the xforms at once
+        form_totals = self.update_xforms(user_ids)
 
-                # Set the flag to true if it was never set.
-                if not user_profile.metadata.get('submissions_suspended'):
-                    # We are using the flag `submissions_suspended` to prevent
-                    # new submissions from coming in while the
-                    # `attachment_storage_bytes` is being calculated.
-                    user_profile.metadata['submissions_suspended'] = True
-                    user_profile.save(update_fields=['metadata'])
-
-            # write out xform progress
-            if self.verbosity >= 1:
+        if self.verbosity >= 1:
+            for xform in xforms:
+                # write out xform progress
                 self.stdout.write(
                     f"Calculating attachments for xform_id #{xform['pk']}"
                     f" (user {xform['user__username']})"
                 )
-            # aggregate total media file size for all media per xform
-            form_attachments = Attachment.objects.filter(
-                instance__xform_id=xform['pk']
-            ).aggregate(total=Sum('media_file_size'))
-
-            if form_attachments['total']:
-                if self.verbosity >= 1:
+                total = form_totals.get(xform['pk'])
+                if total:
                     self.stdout.write(
-                        f'\tUpdating xform attachment storage to '
-                        f"{form_attachments['total']} bytes"
+                        f'\tUpdating xform attachment storage to {total} bytes'
                     )
+                else:
+                    self.stdout.write('\tNo attachments found')
 
-                XForm.objects.filter(
-                    pk=xform['pk']
-                ).update(
-                    attachment_storage_bytes=form_attachments['total']
-                )
-
-            elif self.verbosity >= 1:
-                self.stdout.write('\tNo attachments found')
-
-            last_xform = xform
-
-        # need to call `update_user_profile()` one more time outside the loop
-        # because the last user profile will not be up-to-date otherwise
-        if last_xform:
-            self.update_user_profile(last_xform)
+        # All forms are complete; update their users' profiles
+        self.update_user_profiles(xforms)
 
         if self.verbosity >= 1:
             self.stdout.write('Done!')
 
-    def update_user_profile(self, xform: dict):
-        user_id = xform['user_id']
-        username = xform['user__username']
+    def suspend_submissions(self, user_ids: list[int]):
+        profiles = UserProfile.objects.in_bulk(user_ids, field_name='user_id')
+        user_ids_to_suspend = []
+        user_ids_without_metadata = []
+
+        for user_id in user_ids:
+            try:
+                user_profile = profiles[user_id]
+            except KeyError:
+                # Users created outside KoBoCAT may not have a profile yet.
+                # Do not use `bulk_create()`: `post_save` signals are needed
+                # to set permissions and defaults on new profiles.
+                user_profile, _ = UserProfile.objects.get_or_create(
+                    user_id=user_id
+                )
 
-        if self.verbosity >= 1:
-            self.stdout.write(
-                f'Updating attachment storage total on '
-                f'{username}’s profile'
+            # Some old profiles don't have metadata
+            if user_profile.metadata is None:
+                user_ids_without_metadata.append(user_id)
+            # Set the flag to true if it was never set.
+            elif not user_profile.metadata.get('submissions_suspended'):
+                user_ids_to_suspend.append(user_id)
+
+        # We are using the flag `submissions_suspended` to prevent
+        # new submissions from coming in while the
+        # `attachment_storage_bytes` is being calculated.
+        if user_ids_without_metadata:
+            UserProfile.objects.filter(
+                user_id__in=user_ids_without_metadata
+            ).update(metadata={'submissions_suspended': True})
+
+        if user_ids_to_suspend:
+            UserProfile.objects.filter(user_id__in=user_ids_to_suspend).update(
+                metadata=ReplaceValues(
+                    'metadata',
+                    updates={'submissions_suspended': True},
+                ),
             )
 
-        # Update user's profile (and lock the related row)
+    def update_xforms(self, user_ids: list[int]) -> dict:
+        """
+        Save the total size of the attachments of each xform owned by
+        `user_ids` in a single statement, and return the totals by xform id.
+        Forms without attachments are left untouched.
+        """
+        if not user_ids:
+            return {}
+
+        sql = f"""
+            UPDATE {XForm._meta.db_table} x
+            SET attachment_storage_bytes = totals.total
+            FROM (
+                SELECT i.xform_id, SUM(a.media_file_size) AS total
+                FROM {Attachment._meta.db_table} a
+                INNER JOIN {Instance._meta.db_table} i
+                    ON i.id = a.instance_id
+                INNER JOIN {XForm._meta.db_table} f
+                    ON f.id = i.xform_id
+                WHERE f.user_id = ANY(%s)
+                GROUP BY i.xform_id
+            ) totals
+            WHERE x.id = totals.xform_id AND totals.total > 0
+            RETURNING x.id, x.attachment_storage_bytes
+        """
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user_ids])
+            return dict(cursor.fetchall())
+
+    def update_user_profiles(self, xforms: list[dict]):
+        usernames = {
+            xform['user_id']: xform['user__username'] for xform in xforms
+        }
+
+        if self.verbosity >= 1:
+            for username in usernames.values():
+                self.stdout.write(
+                    f'Updating attachment storage total on '
+                    f'{username}’s profile'
+                )
+
+        # Update users' profiles (and lock the related rows)
         updates = {
             'submissions_suspended': False,
             'attachments_counting_status': 'complete',
@@ -125,13 +168,15 @@ class Command(BaseCommand):
         # right away. See https://stackoverflow.com/a/56122354/1141214 for
         # details.
         subquery = (
-            XForm.objects.filter(user_id=user_id)
+            XForm.objects.filter(user_id=OuterRef('user_id'))
             .values('user_id')
             .annotate(total=Sum('attachment_storage_bytes'))
             .values('total')
         )
 
-        UserProfile.objects.filter(user_id=user_id).update(
+        # One statement for all users: each row gets its own total through
+        # the correlated subquery above.
+        UserProfile.objects.filter(user_id__in=list(usernames)).update(
             attachment_storage_bytes=Subquery(subquery),
             metadata=ReplaceValues(
                 'metadata',
@@ -0,0 +1,47 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class AddIndexConcurrentlyOnPostgreSQL(AddIndexConcurrently):
+    """
+    Build the index concurrently on PostgreSQL only; other back ends (e.g.
+    SQLite used to run tests locally) do not support it.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        else:
+            migrations.AddIndex.database_forwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        else:
+            migrations.AddIndex.database_backwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+
+class Migration(migrations.Migration):
+
+    # `CREATE INDEX CONCURRENTLY` cannot run inside a transaction; it is used
+    # to avoid locking the attachments table while the index is built.
+    atomic = False
+
+    dependencies = [
+        ('logger', '0025_delete_submissioncounter'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgreSQL(
+            model_name='attachment',
+            index=models.Index(fields=['instance', 'media_file_size'], name='logger_atta_instanc_200f2b_idx'),
+        ),
+    ]
@@ -43,6 +43,11 @@ class Attachment(models.Model):
 
     class Meta:
         app_label = 'logger'
+        indexes = [
+            # Lets attachment storage be summed up per instance with index-only
+            # scans
+            models.Index(fields=('instance', 'media_file_size')),
+        ]
 
     def save(self, *args, **kwargs):
         if self.media_file:
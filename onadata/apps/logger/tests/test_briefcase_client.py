@@ -1,5 +1,6 @@
 # coding: utf-8
 import os.path
+from concurrent.futures import Executor, Future
 from io import StringIO, BytesIO
 from urllib.parse import urljoin
 
@@ -11,6 +12,7 @@ from django.urls import reverse
 from django.test import RequestFactory
 from django_digest.test import Client as DigestClient
 from httmock import urlmatch, HTTMock
+from mock import patch
 
 from onadata.apps.api.viewsets.xform_list_api import XFormListApi
 from onadata.apps.logger.models import Instance, XForm
@@ -100,6 +102,35 @@ def instances_xml(url, request, **kwargs):
     return response
 
 
+@urlmatch(netloc=r'(.*\.)?testserver$')
+def forms_and_instances_xml(url, request, **kwargs):
+    if (
+        url.path.endswith(('formList', 'form.xml'))
+        or url.path.find('xformsManifest') > -1
+        or url.path.find('formid-media') > -1
+    ):
+        return form_list_xml(url, request, **kwargs)
+    return instances_xml(url, request, **kwargs)
+
+
+class InlineExecutor(Executor):
+    """
+    Runs submitted calls right away in the calling thread. Mocked responses
+    are built by views which need the test database connection, and it is
+    not shared with other threads.
+    """
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
 class TestBriefcaseClient(TestBase):
 
     def setUp(self):
@@ -180,6 +211,36 @@ class TestBriefcaseClient(TestBase):
             instance_folder_path, 'uuid%s' % instance.uuid, media_file)
         self.assertTrue(storage.exists(media_path))
 
+    def test_download_xforms_with_instances(self):
+        max_workers = 20
+        with patch(
+            'onadata.libs.utils.briefcase_client.ThreadPoolExecutor',
+            InlineExecutor,
+        ), HTTMock(forms_and_instances_xml):
+            self.bc.download_xforms(
+                include_instances=True, max_workers=max_workers
+            )
+
+        # The connection pool must fit all workers
+        adapter = self.bc.session.get_adapter(self.bc.url)
+        self.assertEqual(adapter._pool_maxsize, max_workers + 1)
+        # Each form is downloaded by its own copy of the client
+        self.assertEqual(self.bc.resumption_cursor, 0)
+
+        instance = Instance.objects.all()[0]
+        instance_folder_path = os.path.join(
+            'deno', 'briefcase', 'forms', self.xform.id_string, 'instances',
+            'uuid%s' % instance.uuid,
+        )
+        self.assertTrue(
+            storage.exists(os.path.join(instance_folder_path, 'submission.xml'))
+        )
+        self.assertTrue(
+            storage.exists(
+                os.path.join(instance_folder_path, '1335783522563.jpg')
+            )
+        )
+
     def test_push(self):
         with HTTMock(form_list_xml):
             self.bc.download_xforms()
@@ -0,0 +1,76 @@
+# coding: utf-8
+import os
+from unittest import skipUnless
+
+from django.core.files.base import File
+from django.core.management import call_command
+from django.db import connection
+
+from onadata.apps.main.models import UserProfile
+from onadata.apps.main.tests.test_base import TestBase
+from onadata.apps.logger.models import Attachment, XForm
+
+
+@skipUnless(
+    connection.vendor == 'postgresql',
+    'The command relies on PostgreSQL specific SQL'
+)
+class TestUpdateAttachmentStorageBytes(TestBase):
+
+    def setUp(self):
+        super().setUp()
+        self._publish_transportation_form_and_submit_instance()
+        media_file = os.path.join(
+            self.this_directory, 'fixtures', 'transportation', 'instances',
+            self.surveys[0], '1335783522563.jpg'
+        )
+        with open(media_file, 'rb') as f:
+            self.attachment = Attachment.objects.create(
+                instance=self.xform.instances.first(),
+                media_file=File(f, media_file),
+            )
+        self.assertTrue(self.attachment.media_file_size)
+
+        # Reset counters as if they had never been calculated
+        XForm.objects.filter(pk=self.xform.pk).update(
+            attachment_storage_bytes=0
+        )
+        UserProfile.objects.filter(user=self.user).update(
+            attachment_storage_bytes=0, metadata={}
+        )
+
+    def _assert_counters(self, expected_bytes):
+        self.xform.refresh_from_db()
+        self.assertEqual(self.xform.attachment_storage_bytes, expected_bytes)
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(profile.attachment_storage_bytes, expected_bytes)
+        return profile
+
+    def test_update_attachment_storage_bytes(self):
+        call_command('update_attachment_storage_bytes', verbosity=0)
+        profile = self._assert_counters(self.attachment.media_file_size)
+        self.assertEqual(
+            profile.metadata['attachments_counting_status'], 'complete'
+        )
+        self.assertFalse(profile.metadata['submissions_suspended'])
+
+    def test_update_attachment_storage_bytes_without_profile(self):
+        UserProfile.objects.filter(user=self.user).delete()
+        call_command('update_attachment_storage_bytes', verbosity=0)
+        profile = self._assert_counters(self.attachment.media_file_size)
+        self.assertEqual(
+            profile.metadata['attachments_counting_status'], 'complete'
+        )
+        self.assertFalse(profile.metadata['submissions_suspended'])
+
+    def test_skip_completed_profiles_and_release_them(self):
+        UserProfile.objects.filter(user=self.user).update(
+            metadata={
+                'attachments_counting_status': 'complete',
+                'submissions_suspended': True,
+            }
+        )
+        call_command('update_attachment_storage_bytes', verbosity=0)
+        # Counters of completed profiles are not calculated again
+        profile = self._assert_counters(0)
+        self.assertFalse(profile.metadata['submissions_suspended'])
@@ -1,4 +1,8 @@
 # coding: utf-8
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.mail import get_connection
 from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.models import User
 from django.template.loader import get_template
@@ -11,30 +15,76 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("-m", "--message", dest="message", default=False)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Number of emails to send simultaneously",
+        )
 
     def handle(self, *args, **kwargs):
         message = kwargs.get('message')
         verbosity = kwargs.get('verbosity')
+        workers = kwargs.get('workers')
         get_template('templated_email/notice.email')
         if not message:
             raise CommandError('message must be included in kwargs')
-        # get all users
-        users = User.objects.all()
-        for user in users:
-            name = user.get_full_name()
-            if not name or len(name) == 0:
-                name = user.email
-            if verbosity:
-                print('Emailing name: %(name)s, email: %(email)s'
-                      % {'name': name, 'email': user.email})
-            # send each email separately so users cannot see each other
-            send_templated_mail(
-                template_name='notice',
-                from_email='noreply@formhub.org',
-                recipient_list=[user.email],
-                context={
-                    'username': user.username,
-                    'full_name': name,
-                    'message': message
-                },
-            )
+        # get all users, streaming only the columns needed for the email
+        users = User.objects.only(
+            'email', 'username', 'first_name', 'last_name'
+        ).iterator(chunk_size=1000)
+
+        # Each worker thread reuses its own SMTP connection. Connections are
+        # not shared between threads because the SMTP backend serializes
+        # sends on a lock.
+        self._local = threading.local()
+        self._connections = []
+
+        # Do not submit all users at once to keep memory usage bounded
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                pending = set()
+                for user in users:
+                    if len(pending) >= workers * 2:
+                        done, pending = wait(
+                            pending, return_when=FIRST_COMPLETED
+                        )
+                        for future in done:
+                            future.result()
+                    pending.add(
+                        executor.submit(self._send, user, message, verbosity)
+                    )
+                for future in wait(pending).done:
+                    future.result()
+        finally:
+            for connection in self._connections:
+                connection.close()
+
+    def _get_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = get_connection()
+            connection.open()
+            self._local.connection = connection
+            self._connections.append(connection)
+        return connection
+
+    def _send(self, user, message, verbosity):
+        name = user.get_full_name()
+        if not name or len(name) == 0:
+            name = user.email
+        if verbosity:
+            print('Emailing name: %(name)s, email: %(email)s'
+                  % {'name': name, 'email': user.email})
+        # send each email separately so users cannot see each other
+        send_templated_mail(
+            template_name='notice',
+            from_email='noreply@formhub.org',
+            recipient_list=[user.email],
+            context={
+                'username': user.username,
+                'full_name': name,
+                'message': message
+            },
+            connection=self._get_connection(),
+        )
@@ -67,6 +67,7 @@ class ParsedInstance(models.Model):
     STATUS = '_status'
     DEFAULT_LIMIT = 30000
     DEFAULT_BATCHSIZE = 1000
+    BULK_ACTION_BATCHSIZE = 20000
 
     instance = models.OneToOneField(Instance, related_name="parsed_instance", on_delete=models.CASCADE)
     start_time = models.DateTimeField(null=True)
@@ -184,6 +185,18 @@ class ParsedInstance(models.Model):
 
         return cls._get_mongo_cursor(query, fields)
 
+    @classmethod
+    def query_mongo_no_paging_raw(cls, query, fields):
+        """
+        Same as `query_mongo_no_paging()` but takes Python structures instead
+        of JSON strings, and forwards them to PyMongo as is.
+
+        :param query: dict, already made safe with `MongoHelper.to_safe_dict()`
+        :param fields: list
+        :return: pymongo Cursor
+        """
+        return cls._get_mongo_cursor(query, fields)
+
     @classmethod
     def _get_mongo_cursor(cls, query, fields):
         """
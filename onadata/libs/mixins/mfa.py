@@ -1,13 +1,38 @@
 # coding: utf-8
+from functools import lru_cache
+
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from django.utils.translation import gettext as t
 from rest_framework import exceptions
 
 from onadata.apps.main.models.user_profile import UserProfile
 
 
+@lru_cache(maxsize=None)
+def get_mfa_supported_auth_classes() -> frozenset:
+    return frozenset(settings.MFA_SUPPORTED_AUTH_CLASSES)
+
+
+@receiver(setting_changed)
+def reset_mfa_supported_auth_classes(setting, **kwargs):
+    if setting == 'MFA_SUPPORTED_AUTH_CLASSES':
+        get_mfa_supported_auth_classes.cache_clear()
+
+
 class MFABlockerMixin:
 
+    @classmethod
+    def get_class_path(cls) -> str:
+        # Look into the class' own namespace, subclasses must not use the
+        # path cached on their parent
+        try:
+            return cls.__dict__['_class_path']
+        except KeyError:
+            cls._class_path = f'{cls.__module__}.{cls.__name__}'
+            return cls._class_path
+
     def validate_mfa_not_active(self, user: 'auth.User'):
         """
         Raise an exception if MFA is enabled for user's account.
@@ -17,8 +42,7 @@ class MFABlockerMixin:
         # class based on settings. Useful until we decide whether
         # TokenAuthentication should be deactivated with MFA
         # ToDo Remove the condition when kobotoolbox/kpi#3383 is released/merged
-        class_path = f'{self.__module__}.{self.__class__.__name__}'
-        if class_path not in settings.MFA_SUPPORTED_AUTH_CLASSES:
+        if self.get_class_path() not in get_mfa_supported_auth_classes():
             try:
                 is_mfa_active = user.profile.is_mfa_active
             except UserProfile.DoesNotExist:
@@ -1,24 +1,22 @@
 # coding: utf-8
-from datetime import datetime
-try:
-    from zoneinfo import ZoneInfo
-except ImportError:
-    from backports.zoneinfo import ZoneInfo
-
 from django.conf import settings
+from django.utils.http import http_date
 
 # 10,000,000 bytes
 DEFAULT_CONTENT_LENGTH = getattr(settings, 'DEFAULT_CONTENT_LENGTH', 10000000)
 
+# Headers which do not change from one request to another
+OPENROSA_HEADERS = {
+    'X-OpenRosa-Version': '1.0',
+    'X-OpenRosa-Accept-Content-Length': DEFAULT_CONTENT_LENGTH
+}
+
 
 class OpenRosaHeadersMixin:
     def get_openrosa_headers(self, request, location=True):
-        dt = datetime.now(tz=ZoneInfo('UTC')).strftime('%a, %d %b %Y %H:%M:%S %Z')
-
         data = {
-            'Date': dt,
-            'X-OpenRosa-Version': '1.0',
-            'X-OpenRosa-Accept-Content-Length': DEFAULT_CONTENT_LENGTH
+            'Date': http_date(),
+            **OPENROSA_HEADERS,
         }
 
         if location:
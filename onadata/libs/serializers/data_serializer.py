@@ -1,5 +1,6 @@
 # coding: utf-8
 import json
+from copy import copy
 
 from django.utils.translation import gettext as t
 from rest_framework import serializers
@@ -10,7 +11,25 @@ from onadata.apps.viewer.models.parsed_instance import ParsedInstance
 from onadata.apps.api.mongo_helper import MongoHelper
 
 
-class DataSerializer(serializers.HyperlinkedModelSerializer):
+class CachedFieldsMixin:
+    """
+    Builds serializer fields only once per class. Each new serializer
+    instance gets shallow copies, which is enough because DRF binds fields
+    to their parent when they are accessed.
+    """
+    _fields_cache = {}
+
+    def get_fields(self):
+        cls = self.__class__
+        try:
+            fields = self._fields_cache[cls]
+        except KeyError:
+            fields = self._fields_cache[cls] = super().get_fields()
+
+        return {name: copy(field) for name, field in fields.items()}
+
+
+class DataSerializer(CachedFieldsMixin, serializers.HyperlinkedModelSerializer):
 
     url = serializers.HyperlinkedIdentityField(
         view_name='data-list', lookup_field='pk')
@@ -18,6 +37,7 @@ class DataSerializer(serializers.HyperlinkedModelSerializer):
     class Meta:
         model = XForm
         fields = ('id', 'id_string', 'title', 'description', 'url')
+        read_only_fields = fields
         lookup_field = 'pk'
 
 
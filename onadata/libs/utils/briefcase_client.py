@@ -1,9 +1,11 @@
 # coding: utf-8
+import copy
 import logging
 import math
 import mimetypes
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
 from urllib.parse import urljoin
 from xml.parsers.expat import ExpatError
@@ -12,6 +14,7 @@ import requests
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import InMemoryUploadedFile
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPDigestAuth
 
 from onadata.apps.logger.xform_instance_parser import clean_and_parse_xml
@@ -19,6 +22,7 @@ from onadata.libs.utils.logger_tools import publish_xml_form, publish_form, \
     create_instance
 
 NUM_RETRIES = 3
+DEFAULT_MAX_WORKERS = 8
 
 
 def django_file(file_obj, field_name, content_type):
@@ -82,6 +86,9 @@ class BriefcaseClient:
         self.url = url
         self.user = user
         self.auth = HTTPDigestAuth(username, password)
+        # Reuse connections across requests (and threads)
+        self.session = requests.Session()
+        self._mount_http_adapter(DEFAULT_MAX_WORKERS)
         self.form_list_url = urljoin(self.url, 'formList')
         self.submission_list_url = urljoin(self.url, 'view/submissionList')
         self.download_submission_url = urljoin(self.url,
@@ -91,6 +98,13 @@ class BriefcaseClient:
         self.resumption_cursor = 0
         self.logger = logging.getLogger('console_logger')
 
+    def _mount_http_adapter(self, max_workers):
+        # Keep one connection per worker thread, plus one for the main thread,
+        # otherwise urllib3 discards connections when the pool is full
+        adapter = HTTPAdapter(pool_maxsize=max_workers + 1)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
     def _get_form_list(self, xml_text):
         xml_doc = clean_and_parse_xml(xml_text)
         forms = []
@@ -121,7 +135,16 @@ class BriefcaseClient:
 
             self.download_media_files(manifest_doc, manifest_path)
 
-    def download_xforms(self, include_instances=False):
+    def download_xforms(
+        self, include_instances=False, max_workers=DEFAULT_MAX_WORKERS
+    ):
+        """
+        Download all forms and their media files. Submissions are downloaded
+        too if `include_instances` is True, using up to `max_workers` threads
+        (one form per thread).
+        """
+        self._mount_http_adapter(max_workers)
+
         # fetch formList
         if not self._get_response(self.form_list_url):
             response = self._current_response.content \
@@ -135,36 +158,50 @@ class BriefcaseClient:
 
         self.logger.debug('Successfully fetched %s.' % self.form_list_url)
 
-        for id_string, download_url, manifest_url in forms:
-            form_path = os.path.join(
-                self.forms_path, id_string, '%s.xml' % id_string)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = []
+            for id_string, download_url, manifest_url in forms:
+                form_path = os.path.join(
+                    self.forms_path, id_string, '%s.xml' % id_string)
+
+                if not default_storage.exists(form_path):
+                    if not self._get_response(download_url):
+                        self.logger.error("Failed to download xform %s."
+                                          % download_url)
+                        continue
+
+                    form_res = self._current_response
+                    content = ContentFile(form_res.content.strip())
+                    default_storage.save(form_path, content)
+                else:
+                    form_res = default_storage.open(form_path)
+                    content = form_res.read()
 
-            if not default_storage.exists(form_path):
-                if not self._get_response(download_url):
-                    self.logger.error("Failed to download xform %s."
-                                      % download_url)
-                    continue
+                self.logger.debug("Fetched %s." % download_url)
 
-                form_res = self._current_response
-                content = ContentFile(form_res.content.strip())
-                default_storage.save(form_path, content)
-            else:
-                form_res = default_storage.open(form_path)
-                content = form_res.read()
+                self.download_manifest(manifest_url, id_string)
 
-            self.logger.debug("Fetched %s." % download_url)
+                if include_instances:
+                    futures.append(
+                        executor.submit(self._download_form_instances, id_string)
+                    )
 
-            self.download_manifest(manifest_url, id_string)
+            # Raise exceptions of workers, if any
+            for future in futures:
+                future.result()
 
-            if include_instances:
-                self.download_instances(id_string)
-                self.logger.debug("Done downloading submissions for %s" %
-                                  id_string)
+    def _download_form_instances(self, id_string):
+        # `_current_response` and `resumption_cursor` are specific to each
+        # download, give every form (i.e. thread) its own copy of the client
+        client = copy.copy(self)
+        client.resumption_cursor = 0
+        client.download_instances(id_string)
+        self.logger.debug("Done downloading submissions for %s" % id_string)
 
     @retry(NUM_RETRIES)
     def _get_response(self, url, params=None):
         self._current_response = None
-        response = requests.get(url, auth=self.auth, params=params)
+        response = self.session.get(url, auth=self.auth, params=params)
         success = response.status_code == 200
         self._current_response = response
 
@@ -173,13 +210,13 @@ class BriefcaseClient:
     @retry(NUM_RETRIES)
     def _get_media_response(self, url):
         self._current_response = None
-        head_response = requests.head(url, auth=self.auth)
+        head_response = self.session.head(url, auth=self.auth)
 
         # S3 redirects, avoid using formhub digest on S3
         if head_response.status_code == 302:
             url = head_response.headers.get('location')
 
-        response = requests.get(url)
+        response = self.session.get(url)
         success = response.status_code == 200
         self._current_response = response
 